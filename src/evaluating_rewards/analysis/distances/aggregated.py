@@ -14,8 +14,10 @@
 
 """Helper methods to manipulate aggregated values returned by scripts.distances.*"""
 
+import functools
 from typing import Iterable, Mapping, Tuple
 
+import numpy as np
 import pandas as pd
 
 from evaluating_rewards.distances import common_config
@@ -38,15 +40,30 @@ def oned_mapping_to_series(
     Returns:
         A Series with a multi-index based on the configurations.
     """
-    vals = {(xtype, xpath, ytype, ypath): v for ((xtype, xpath), (ytype, ypath)), v in vals.items()}
-    vals = pd.Series(vals)
-    vals.index.names = [
-        "target_reward_type",
-        "target_reward_path",
-        "source_reward_type",
-        "source_reward_path",
-    ]
-    return vals
+    # Build the index and values directly, avoiding an intermediate dict keyed by 4-tuples.
+    index = _multi_index(tuple(vals.keys()))
+    return pd.Series(np.fromiter(vals.values(), dtype=float, count=len(vals)), index=index)
+
+
+@functools.lru_cache(maxsize=64)
+def _multi_index(
+    keys: Tuple[Tuple[common_config.RewardCfg, common_config.RewardCfg], ...]
+) -> pd.MultiIndex:
+    """Index for `oned_mapping_to_series` with keys `keys`.
+
+    Cached: callers typically convert many mappings with the same keys (e.g. each of the
+    lower, middle and upper bounds), and building a `MultiIndex` dominates the conversion.
+    This is safe since indices are immutable.
+    """
+    return pd.MultiIndex.from_tuples(
+        [tuple(xcfg) + tuple(ycfg) for xcfg, ycfg in keys],
+        names=[
+            "target_reward_type",
+            "target_reward_path",
+            "source_reward_type",
+            "source_reward_path",
+        ],
+    )
 
 
 def select_subset(
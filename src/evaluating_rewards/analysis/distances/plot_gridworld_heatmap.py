@@ -16,7 +16,7 @@
 
 import collections
 import os
-from typing import Any, Dict, Iterable, Mapping, Optional
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
 
 from imitation.util import util
 import matplotlib.pyplot as plt
@@ -115,17 +115,18 @@ def state_to_3d(reward: np.ndarray, ns: int, na: int) -> np.ndarray:
         - na: number of actions.
 
     Returns:
-        State-action-next state reward from tiling `reward`.
+        State-action-next state reward from tiling `reward`. This is a read-only view
+        of `reward` (via broadcasting), so does not allocate `ns * na * ns` elements.
     """
     assert reward.ndim == 1
     assert reward.shape[0] == ns
-    return np.tile(reward[:, np.newaxis, np.newaxis], (1, na, ns))
+    return np.broadcast_to(reward[:, np.newaxis, np.newaxis], (ns, na, ns))
 
 
 def grid_to_3d(reward: np.ndarray) -> np.ndarray:
     """Convert gridworld state-only reward R[i,j] to 3D reward R[s,a,s']."""
     assert reward.ndim == 2
-    reward = reward.flatten()
+    reward = reward.reshape(-1)
     ns = reward.shape[0]
     return state_to_3d(reward, ns, 5)
 
@@ -164,16 +165,69 @@ CANONICAL_DESHAPE_FN = {
 }
 
 
+def _deshaped_distance(
+    kind: str, discount: float
+) -> Tuple[
+    Callable[[np.ndarray, np.ndarray], np.ndarray],
+    Callable[[np.ndarray, np.ndarray, np.ndarray], float],
+]:
+    """Splits a `_direct` or `_pearson` distance `kind` into deshaping and then comparing.
+
+    Returns:
+        A tuple `(deshape, distance)` such that `distance(deshape(a, dist), deshape(b, dist), dist)`
+        is the distance between rewards `a` and `b`, as computed by
+        `tabular.canonical_reward_distance` or `tabular.deshape_pearson_distance`.
+        Deshaping is the costly step, and need only be done once per reward rather than per pair.
+
+    Raises:
+        ValueError if the canonicalizer in `kind` is not recognized.
+    """
+    canonical_kind = "_".join(kind.split("_")[:-1])
+    try:
+        deshape_fn = CANONICAL_DESHAPE_FN[canonical_kind]
+    except KeyError as e:
+        raise ValueError(f"Invalid canonicalizer '{canonical_kind}'") from e
+
+    if kind.endswith("_direct"):
+
+        def deshape(rew: np.ndarray, dist: np.ndarray) -> np.ndarray:
+            return tabular.canonical_reward(rew, discount, deshape_fn, p=1, dist=dist)
+
+        def distance(rewa: np.ndarray, rewb: np.ndarray, dist: np.ndarray) -> float:
+            return 0.5 * tabular.direct_distance(rewa, rewb, p=1, dist=dist)
+
+    else:
+
+        def deshape(rew: np.ndarray, dist: np.ndarray) -> np.ndarray:
+            del dist
+            return deshape_fn(rew, discount)
+
+        distance = tabular.pearson_distance
+
+    return deshape, distance
+
+
 def compute_divergence(reward_cfg: Dict[str, Any], discount: float, kind: str) -> pd.Series:
     """Compute divergence for each pair of rewards in `reward_cfg`."""
     rewards = {name: make_reward(cfg, discount) for name, cfg in reward_cfg.items()}
+    deshape = distance_fn = None
+    if kind.endswith("_direct") or kind.endswith("_pearson"):
+        deshape, distance_fn = _deshaped_distance(kind, discount)
+
+    # The distribution depends only on the shape of the gridworld, and rewards are deshaped
+    # with respect to it: compute each once per shape, rather than once per pair of rewards.
+    dists = {}
+    deshaped = {}
     divergence = collections.defaultdict(dict)
     for src_name, src_reward in rewards.items():
+        xlen, ylen = reward_cfg[src_name]["state_reward"].shape
+        if (xlen, ylen) not in dists:
+            dists[(xlen, ylen)] = build_dist(src_reward, xlen, ylen)
+        distribution = dists[(xlen, ylen)]
+
         for target_name, target_reward in rewards.items():
             if target_name == "evaluating_rewards/Zero-v0":
                 continue
-            xlen, ylen = reward_cfg[src_name]["state_reward"].shape
-            distribution = build_dist(src_reward, xlen, ylen)
 
             if kind == "npec":
                 div = tabular.npec_distance(
@@ -193,24 +247,14 @@ def compute_divergence(reward_cfg: Dict[str, Any], discount: float, kind: str) -
                     discount=discount,
                     use_min=use_min,
                 )
-            elif kind.endswith("_direct") or kind.endswith("_pearson"):
-                if kind.endswith("_direct"):
-                    distance_fn = tabular.canonical_reward_distance
-                else:
-                    distance_fn = tabular.deshape_pearson_distance
-
-                canonical_kind = "_".join(kind.split("_")[:-1])
-                try:
-                    deshape_fn = CANONICAL_DESHAPE_FN[canonical_kind]
-                except KeyError as e:
-                    raise ValueError(f"Invalid canonicalizer '{canonical_kind}'") from e
-
+            elif deshape is not None:
+                for name in (src_name, target_name):
+                    if (name, xlen, ylen) not in deshaped:
+                        deshaped[(name, xlen, ylen)] = deshape(rewards[name], distribution)
                 div = distance_fn(
-                    src_reward,
-                    target_reward,
-                    deshape_fn=deshape_fn,
-                    dist=distribution,
-                    discount=discount,
+                    deshaped[(src_name, xlen, ylen)],
+                    deshaped[(target_name, xlen, ylen)],
+                    distribution,
                 )
             else:
                 raise ValueError(f"Unrecognized kind '{kind}'")
@@ -52,19 +52,21 @@ def bootstrap(
     return np.array(vals)
 
 
-def empirical_ci(arr: np.ndarray, alpha: float = 95.0) -> np.ndarray:
+def empirical_ci(arr: np.ndarray, alpha: float = 95.0, axis: Optional[int] = None) -> np.ndarray:
     """Computes percentile range in an array of values.
 
     Args:
         arr: An array.
         alpha: Percentile confidence interval.
+        axis: Axis along which to compute the percentiles; by default, the flattened array.
 
     Returns:
         A triple of the lower bound, median and upper bound of the confidence interval
-        with a width of alpha.
+        with a width of alpha. If `axis` is specified, each element of the triple is an
+        array of the shape of `arr` with `axis` removed.
     """
     percentiles = 50 - alpha / 2, 50, 50 + alpha / 2
-    return np.percentile(arr, percentiles)
+    return np.percentile(arr, percentiles, axis=axis)
 
 
 def cross_distance(
@@ -17,6 +17,7 @@
 Used in `plot_heatmap`, `epic`, `npec` and `erc`.
 """
 
+import functools
 import glob
 import itertools
 import math
@@ -198,6 +199,13 @@ def _update_common_configs() -> None:
 _update_common_configs()
 
 
+@functools.lru_cache(maxsize=None)
+def _canonicalize_reward_cfg(kind: str, path: str, data_root: str) -> RewardCfg:
+    if path != "dummy" and data_root:
+        path = os.path.join(data_root, path)
+    return (kind, path)
+
+
 def canonicalize_reward_cfg(reward_cfg: RewardCfg, data_root: str) -> RewardCfg:
     """Canonicalize path in reward configuration.
 
@@ -206,6 +214,9 @@ def canonicalize_reward_cfg(reward_cfg: RewardCfg, data_root: str) -> RewardCfg:
     any iterable pair as input `reward_cfg`. This is important since Sacred has the bad habit of
     converting tuples to lists in configurations.
 
+    Results are memoized, so canonicalizing the same configuration repeatedly returns the same
+    tuple object.
+
     Args:
         reward_cfg: Iterable of configurations to canonicailze.
         data_root: The root to join paths to.
@@ -214,6 +225,4 @@ def canonicalize_reward_cfg(reward_cfg: RewardCfg, data_root: str) -> RewardCfg:
         Canonicalized RewardCfg.
     """
     kind, path = reward_cfg
-    if path != "dummy":
-        path = os.path.join(data_root, path)
-    return (kind, path)
+    return _canonicalize_reward_cfg(kind, path, data_root)
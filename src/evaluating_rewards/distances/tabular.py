@@ -59,21 +59,23 @@ def closest_potential(reward: np.ndarray, target: np.ndarray, discount: float) -
     assert reward.ndim == 3
     assert reward.shape == target.shape
 
-    # Compute coefficients and targets
+    # This is linear regression of `target - reward` on features
+    # `discount * onehot(s') - onehot(s)`, one row per transition `(s, a, s')`. Rather than
+    # materializing the `(n_states ** 2 * n_actions, n_states)` design matrix X and calling
+    # `np.linalg.lstsq`, solve the normal equations `X^T X potential = X^T y` analytically.
+    # `X^T X = n_actions * (n_states * (1 + discount ** 2) I - 2 * discount * J)`, where J is the
+    # all-ones matrix. Its eigenvalues are `hi` (on vectors summing to zero) and `lo` (on the
+    # constant vector), so its pseudo-inverse is applied by scaling each component separately.
     n_states, n_actions, _ = reward.shape
-    eye = np.eye(n_states)
-    new_pot = discount * eye[np.newaxis, np.newaxis, :, :]
-    old_pot = eye[:, np.newaxis, np.newaxis, :]
-    x_vals = new_pot - old_pot
-    x_vals = x_vals.repeat(n_actions, axis=1)
     y_vals = target - reward
+    xty = discount * y_vals.sum(axis=(0, 1)) - y_vals.sum(axis=(1, 2))
+    hi = n_actions * n_states * (1 + discount ** 2)
+    lo = n_actions * n_states * (1 - discount) ** 2
 
-    # Flatten for linear regression
-    x_vals = x_vals.reshape(-1, n_states)
-    y_vals = y_vals.flatten()
-
-    # TODO(): report convergence-related statistics such as singular values?
-    potential, _, _, _ = np.linalg.lstsq(x_vals, y_vals, rcond=None)
+    mean = np.mean(xty)
+    # If `lo` is zero (undiscounted), constant potentials have no effect: `lstsq` would return the
+    # minimum-norm solution, which has no constant component.
+    potential = (xty - mean) / hi + (mean / lo if lo > 0 else 0.0)
 
     return potential
 
@@ -182,25 +184,78 @@ def pearson_distance(
         Computes the Pearson correlation coefficient rho, optionally weighted by dist.
         Returns the square root of 1 minus rho.
     """
-    if dist is None:
-        dist = np.ones_like(rewa) / np.product(rewa.shape)
-    _check_dist(dist)
-    assert rewa.shape == dist.shape
     assert rewa.shape == rewb.shape
+    if dist is None:
+        # Fast path for uniform distribution: the normalization cancels out, so plain dot products
+        # suffice, avoiding materializing `dist` and the weighted averages.
+        rewa = rewa.flatten() - np.mean(rewa)
+        rewb = rewb.flatten() - np.mean(rewb)
+
+        vara = np.dot(rewa, rewa)
+        varb = np.dot(rewb, rewb)
+        cov = np.dot(rewa, rewb)
+    else:
+        _check_dist(dist)
+        assert rewa.shape == dist.shape
 
-    dist = dist.flatten()
-    rewa = _center(rewa.flatten(), dist)
-    rewb = _center(rewb.flatten(), dist)
+        dist = dist.flatten()
+        rewa = _center(rewa.flatten(), dist)
+        rewb = _center(rewb.flatten(), dist)
 
-    vara = np.average(np.square(rewa), weights=dist)
-    varb = np.average(np.square(rewb), weights=dist)
-    cov = np.average(rewa * rewb, weights=dist)
+        vara = np.average(np.square(rewa), weights=dist)
+        varb = np.average(np.square(rewb), weights=dist)
+        cov = np.average(rewa * rewb, weights=dist)
     corr = cov / (np.sqrt(vara) * np.sqrt(varb))
     corr = min(corr, 1.0)  # floating point error sometimes rounds above 1.0
 
     return np.sqrt(0.5 * (1 - corr))
 
 
+def pearson_distance_matrix(rewxs: np.ndarray, rewys: Optional[np.ndarray] = None) -> np.ndarray:
+    """Computes `pearson_distance` between all pairs of rows from `rewxs` and `rewys`.
+
+    The (unweighted) Pearson correlation coefficient between two vectors is the dot product
+    of their centered and normalized versions, so all pairs can be computed in a single
+    matrix multiplication rather than one `pearson_distance` call per pair.
+
+    Args:
+        rewxs: An array of shape `(..., nx, n)`.
+        rewys: An array of shape `(..., ny, n)`. Leading dimensions must broadcast with `rewxs`.
+            If omitted, computes distances between all pairs of rows of `rewxs`.
+
+    Returns:
+        An array of shape `(..., nx, ny)` whose `(..., i, j)`'th entry is the Pearson distance
+        between `rewxs[..., i, :]` and `rewys[..., j, :]`. If `rewys` is omitted, this is
+        exactly symmetric in its last two dimensions.
+    """
+
+    # Two passes over the rewards are needed: one for the mean, and one for the products of the
+    # centered rewards. Fusing these into a single pass (e.g. GEMM on the raw rewards, subtracting
+    # the outer product of the means afterwards) suffers catastrophic cancellation when the mean
+    # is large relative to the variance. So center once, then compute the norms and the GEMM on
+    # the centered rewards, normalizing the (small) correlation matrix rather than the rewards.
+    def center(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Compute in (at least) double precision even for single-precision inputs: otherwise
+        # `1 - corr` suffers catastrophic cancellation for highly correlated rewards.
+        x = x - np.mean(x, axis=-1, keepdims=True, dtype=np.float64)
+        return x, np.sqrt(np.einsum("...ij,...ij->...i", x, x))
+
+    xs, xnorms = center(rewxs)
+    if rewys is None:
+        corr = np.matmul(xs, np.swapaxes(xs, -1, -2))
+        corr /= xnorms[..., :, np.newaxis] * xnorms[..., np.newaxis, :]
+        # Mirror upper triangle: floating point error can otherwise make it slightly asymmetric.
+        corr = np.triu(corr) + np.swapaxes(np.triu(corr, k=1), -1, -2)
+    else:
+        assert rewxs.shape[-1] == rewys.shape[-1]
+        ys, ynorms = center(rewys)
+        corr = np.matmul(xs, np.swapaxes(ys, -1, -2))
+        corr /= xnorms[..., :, np.newaxis] * ynorms[..., np.newaxis, :]
+    corr = np.minimum(corr, 1.0)  # floating point error sometimes rounds above 1.0
+
+    return np.sqrt(0.5 * (1 - corr))
+
+
 def spearman_distance(rewa: np.ndarray, rewb: np.ndarray) -> float:
     """Computes dissimilarity derived from Spearman correlation coefficient.
 
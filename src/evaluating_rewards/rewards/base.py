@@ -34,7 +34,7 @@ from typing import (
 )
 
 import gym
-from imitation.data import rollout, types
+from imitation.data import types
 from imitation.rewards import reward_net
 from imitation.util import networks, serialize
 import numpy as np
@@ -910,27 +910,25 @@ def compute_return_from_rews(
 
     start_idxs = idxs[:-1]
     end_idxs = idxs[1:]
-    if discount < 1.0:
-        # Discounted -- need to do the slow but general thing.
-        ep_returns = {}
-        for k, v in rews.items():
-            rets = []
-            for start, end in zip(start_idxs, end_idxs):
-                rets.append(np.polyval(np.flip(v[start:end]), discount))
-            ep_returns[k] = np.array(rets)
-    else:
-        # Fast path for undiscounted case: sum over the slices.
-        if len(start_idxs) == 0:
-            # No completed episodes: nothing to compute returns over.
-            ep_returns = {k: np.array([]) for k in rews.keys()}
-        else:
-            # Truncate at last episode completion index.
-            last_idx = idxs[-1]
-            rews = {k: v[:last_idx] for k, v in rews.items()}
-            # Now add over each interval split by the episode boundaries.
-            ep_returns = {k: np.add.reduceat(v, start_idxs) for k, v in rews.items()}
+    if len(start_idxs) == 0:
+        # No completed episodes: nothing to compute returns over.
+        return {k: np.array([]) for k in rews.keys()}
 
-    return ep_returns
+    # Truncate at last episode completion index.
+    last_idx = idxs[-1]
+    rews = {k: v[:last_idx] for k, v in rews.items()}
+    if discount < 1.0:
+        lengths = end_idxs - start_idxs
+        # Precompute `discount ** t` for each timestep `t` within an episode, shared by all models.
+        gammas = np.power(discount, np.arange(np.max(lengths)))
+        if np.all(lengths == lengths[0]):
+            # Fast path for fixed-horizon episodes: return is just a matrix-vector product.
+            return {k: v.reshape(-1, lengths[0]) @ gammas for k, v in rews.items()}
+        # Otherwise, weight each reward by `discount ** t` and sum over episodes below.
+        weights = gammas[np.arange(last_idx) - np.repeat(start_idxs, lengths)]
+        rews = {k: v * weights for k, v in rews.items()}
+    # Now add over each interval split by the episode boundaries.
+    return {k: np.add.reduceat(v, start_idxs) for k, v in rews.items()}
 
 
 def compute_return_of_models(
@@ -950,8 +948,18 @@ def compute_return_of_models(
     """
     # Reward models are Markovian so only operate on a timestep at a time,
     # expecting input shape (batch_size, ) + {obs,act}_shape. Flatten the
-    # trajectories to accommodate this.
-    transitions = rollout.flatten_trajectories(trajectories)
+    # trajectories to accommodate this. The flattened arrays are fed to every model,
+    # so build them once, without the per-timestep info dicts of `rollout.flatten_trajectories`.
+    lengths = np.array([len(traj.acts) for traj in trajectories])
+    dones = np.zeros(np.sum(lengths), dtype=bool)
+    dones[np.cumsum(lengths) - 1] = True
+    transitions = types.Transitions(
+        obs=np.concatenate([traj.obs[:-1] for traj in trajectories]),
+        acts=np.concatenate([traj.acts for traj in trajectories]),
+        next_obs=np.concatenate([traj.obs[1:] for traj in trajectories]),
+        dones=dones,
+        infos=None,
+    )
     preds = evaluate_models(models, transitions)
 
     return compute_return_from_rews(preds, transitions.dones, discount)
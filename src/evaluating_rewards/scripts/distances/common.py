@@ -54,11 +54,18 @@ def load_models(
     Returns:
          A mapping from reward configurations to the loaded reward model.
     """
+    # Remove duplicates (e.g. a configuration on both the x and y axis) so each loads only once.
+    reward_cfgs = list(dict.fromkeys(tuple(cfg) for cfg in reward_cfgs))
+    # The environment is only needed for its spaces (and occasionally an `env_method` call)
+    # while loading, so a single in-process environment shared by all models suffices.
     venv = vec_env.DummyVecEnv([lambda: gym.make(env_name)])
-    return {
-        (kind, path): serialize.load_reward(kind, path, venv, discount)
-        for kind, path in reward_cfgs
-    }
+    try:
+        return {
+            (kind, path): serialize.load_reward(kind, path, venv, discount)
+            for kind, path in reward_cfgs
+        }
+    finally:
+        venv.close()
 
 
 def load_models_create_sess(
@@ -231,12 +238,12 @@ def make_main(
         os.makedirs(log_dir, exist_ok=True)  # fail fast if log directory cannot be created
 
         # Sacred turns our tuples into lists :(, undo
-        x_reward_cfgs = [
+        x_reward_cfgs = tuple(
             common_config.canonicalize_reward_cfg(cfg, data_root) for cfg in x_reward_cfgs
-        ]
-        y_reward_cfgs = [
+        )
+        y_reward_cfgs = tuple(
             common_config.canonicalize_reward_cfg(cfg, data_root) for cfg in y_reward_cfgs
-        ]
+        )
 
         # If `compute_vals` is a capture function, then Sacred will fill in other parameters
         aggregated = compute_vals(x_reward_cfgs=x_reward_cfgs, y_reward_cfgs=y_reward_cfgs)
@@ -378,7 +378,8 @@ def compute_vals(
     """Computes values for dissimilarity heatmaps.
 
     Args:
-        ray_kwargs: Passed through to `ray.init`.
+        ray_kwargs: Passed through to `ray.init`, raising `num_cpus` (if set) to at least
+            the number of CPUs needed to execute each seed.
         num_cpus: number of CPUs needed to execute each seed.
         computation_kind: method to compute results, either "sample" or "mesh" (generally slower).
         aggregate_fns: Mapping from strings to aggregators to be applied on sequences of floats.
@@ -418,6 +419,9 @@ def compute_vals(
     else:
         raise ValueError(f"Unrecognized computation kind '{computation_kind}'")
 
+    if "num_cpus" in ray_kwargs:
+        # Ray never schedules a seed needing more CPUs than it has: make room for at least one.
+        ray_kwargs = dict(ray_kwargs, num_cpus=max(ray_kwargs["num_cpus"], num_cpus))
     ray.init(**ray_kwargs)
 
     refs = []
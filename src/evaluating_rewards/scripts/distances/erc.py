@@ -15,18 +15,22 @@
 """CLI script to plot heatmaps based on episode return of reward models."""
 
 import collections
+import concurrent.futures
+import functools
+import hashlib
 import itertools
 import logging
 import os
 import pickle
-from typing import Any, Dict, Iterable, Mapping
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence
 
-from imitation.data import rollout
+from imitation.data import rollout, types
 from imitation.util import util as imit_util
 import numpy as np
 import sacred
+import scipy.stats
 
-from evaluating_rewards import datasets
+from evaluating_rewards import datasets, serialize
 from evaluating_rewards.analysis import util
 from evaluating_rewards.distances import common_config, tabular
 from evaluating_rewards.rewards import base
@@ -36,6 +40,9 @@ from evaluating_rewards.scripts.distances import common
 erc_distance_ex = sacred.Experiment("erc_distance")
 logger = logging.getLogger("evaluating_rewards.scripts.distances.erc")
 
+# Upper bound on memory used by each chunk of resampled returns when bootstrapping.
+_BOOTSTRAP_CHUNK_BYTES = 2 ** 28
+
 
 common.make_config(erc_distance_ex)
 
@@ -54,10 +61,15 @@ def default_config(env_name):
         "env_name": env_name,
         "policy_type": "random",
         "policy_path": "dummy",
-        "n_envs": 16,
+        # Episodes are independent: step one environment per CPU, each in its own process.
+        # Sampling stops once enough episodes complete, so more than `n_episodes` is wasted.
+        "n_envs": min(n_episodes, os.cpu_count()),
         "parallel": True,
     }
     dataset_tag = "random"
+    # Directory to cache returns in, keyed by the trajectories and reward checkpoints; None to
+    # disable. Trajectories differ unless the seed is fixed, so this only helps repeated runs.
+    returns_cache_dir = None
 
     _ = locals()
     del _
@@ -117,17 +129,94 @@ erc_distance_ex.add_named_config("test", FAST_CONFIG)
 erc_distance_ex.add_named_config("fast", FAST_CONFIG)
 
 
+def _trajectories_key(trajectories: Sequence[types.Trajectory], discount: float) -> str:
+    """Digest of the observations and actions in `trajectories` and of `discount`."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(discount).encode())
+    for traj in trajectories:
+        h.update(np.ascontiguousarray(traj.obs).tobytes())
+        h.update(np.ascontiguousarray(traj.acts).tobytes())
+    return h.hexdigest()
+
+
+def _cfg_key(cfg: common_config.RewardCfg) -> str:
+    """Digest of `cfg` and its checkpoint, suitable as the name of an array in an `.npz` file.
+
+    The checkpoint is identified by the size and modification time of its path and (for a
+    directory) the entries directly inside it, so a checkpoint retrained in place has a new key.
+    """
+    kind, path = cfg
+    path = os.path.join(serialize.get_output_dir(), path)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((kind, path)).encode())
+    if os.path.exists(path):
+        stats = [(path, os.stat(path))]
+        if os.path.isdir(path):
+            stats += sorted((entry.path, entry.stat()) for entry in os.scandir(path))
+        for fname, stat in stats:
+            h.update(repr((fname, stat.st_size, stat.st_mtime_ns)).encode())
+    return h.hexdigest()
+
+
+def cached_compute_return_of_models(
+    models: Mapping[common_config.RewardCfg, base.RewardModel],
+    trajectories: Sequence[types.Trajectory],
+    discount: float,
+    cache_dir: Optional[str] = None,
+) -> Mapping[common_config.RewardCfg, np.ndarray]:
+    """Like `base.compute_return_of_models`, but caching returns in `cache_dir`.
+
+    The returns for each batch of trajectories are stored in a file `returns-{key}.npz`, where
+    `key` is a digest of the trajectories and `discount`; within it, models are keyed by
+    `_cfg_key`. Only models that are missing from the cache are evaluated. Files are replaced
+    atomically, but concurrent runs sharing `cache_dir` may drop each other's new entries.
+
+    Args:
+        models: a mapping from configurations to reward models.
+        trajectories: the trajectories to compute the returns of.
+        discount: the discount rate for computing returns.
+        cache_dir: directory to cache returns in. If None, do not cache.
+
+    Returns:
+        A mapping from configurations to the return of each trajectory under that model.
+    """
+    if cache_dir is None:
+        return base.compute_return_of_models(models, trajectories, discount)
+
+    path = os.path.join(cache_dir, f"returns-{_trajectories_key(trajectories, discount)}.npz")
+    cached = {}
+    if os.path.exists(path):
+        with np.load(path) as data:
+            cached = dict(data)
+    cfg_keys = {cfg: _cfg_key(cfg) for cfg in models}
+    missing = {cfg: model for cfg, model in models.items() if cfg_keys[cfg] not in cached}
+    logger.info(f"Returns cached for {len(models) - len(missing)}/{len(models)} models")
+
+    if missing:
+        rets = base.compute_return_of_models(missing, trajectories, discount)
+        cached.update({cfg_keys[cfg]: v for cfg, v in rets.items()})
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, **cached)
+        os.replace(tmp_path, path)
+
+    return {cfg: cached[cfg_keys[cfg]] for cfg in models}
+
+
 def batch_compute_returns(
     trajectory_callable: datasets.TrajectoryCallable,
     models: Mapping[common_config.RewardCfg, base.RewardModel],
     discount: float,
     n_episodes: int,
     batch_episodes: int = 256,
+    cache_dir: Optional[str] = None,
 ) -> Mapping[common_config.RewardCfg, np.ndarray]:
     """Compute returns under `models` of trajectories sampled from `trajectory_callable`.
 
     Batches the trajectory sampling and computation to efficiently compute returns with a small
-    memory footprint.
+    memory footprint. The next batch of trajectories is sampled in a background thread while
+    the reward models are evaluated on the current batch, so environment stepping and reward
+    model evaluation overlap.
 
     Args:
         trajectory_callable: a callable which generates trajectories.
@@ -137,34 +226,108 @@ def batch_compute_returns(
         batch_episodes: the maximum number of episodes to sample at a time. This should be chosen
             to be large enough to take advantage of parallel evaluation of the reward models and to
             amortize the fixed costs inherent in trajectory sampling. However, it should be small
-            enough that a batch of trajectories does not take up too much memory. The default of
-            256 episodes works well in most environments, but might need to be decreased for
-            environments with very large trajectories (e.g. image observations, long episodes).
+            enough that a batch of trajectories does not take up too much memory: up to two
+            batches are held in memory at once. The default of 256 episodes works well in most
+            environments, but might need to be decreased for environments with very large
+            trajectories (e.g. image observations, long episodes).
+        cache_dir: directory to cache returns in, see `cached_compute_return_of_models`.
+            If None, do not cache.
     """
     logger.info("Computing returns")
-    remainder = n_episodes
+    batch_sizes = [
+        min(batch_episodes, n_episodes - i) for i in range(0, n_episodes, batch_episodes)
+    ]
     returns = collections.defaultdict(list)
-    while remainder > 0:
-        batch_size = min(batch_episodes, remainder)
-
-        logger.info(f"Computing returns for {batch_size} episodes: {remainder}/{n_episodes} left")
-        trajectories = trajectory_callable(rollout.min_episodes(batch_size))
-        rets = base.compute_return_of_models(models, trajectories, discount)
-        for k, v in rets.items():
-            returns[k].append(v)
-        remainder -= batch_size
+    # A single worker: `trajectory_callable` is only ever called from one thread at a time.
+    # Models are evaluated in this thread, where the default TensorFlow session is set.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        sample = functools.partial(executor.submit, trajectory_callable)
+        next_trajectories = sample(rollout.min_episodes(batch_sizes[0])) if batch_sizes else None
+        remainder = n_episodes
+        for i, batch_size in enumerate(batch_sizes):
+            trajectories = next_trajectories.result()
+            if i + 1 < len(batch_sizes):
+                next_trajectories = sample(rollout.min_episodes(batch_sizes[i + 1]))
+
+            logger.info(
+                f"Computing returns for {batch_size} episodes: {remainder}/{n_episodes} left"
+            )
+            rets = cached_compute_return_of_models(models, trajectories, discount, cache_dir)
+            for k, v in rets.items():
+                returns[k].append(v)
+            remainder -= batch_size
     returns = {k: np.concatenate(v) for k, v in returns.items()}
     return returns
 
 
-@erc_distance_ex.capture
+def _bootstrap_correlation_distance(
+    returns: Mapping[common_config.RewardCfg, np.ndarray],
+    x_reward_cfgs: Sequence[common_config.RewardCfg],
+    y_reward_cfgs: Sequence[common_config.RewardCfg],
+    rank: bool,
+    n_bootstrap: int,
+    alpha: float,
+) -> common_config.AggregatedDistanceReturn:
+    """Bootstrap correlation distance between all pairs of `x_reward_cfgs` and `y_reward_cfgs`.
+
+    Each bootstrap sample resamples episodes once, and computes the distance between all pairs
+    of models on that sample with `tabular.pearson_distance_matrix`. If `rank` is true, the
+    returns are first converted to ranks, giving the Spearman rather than Pearson distance.
+
+    Bootstrap samples are processed in chunks of up to `_BOOTSTRAP_CHUNK_BYTES`, computing the
+    distance matrices for the whole chunk in a single batched matrix multiplication.
+    """
+
+    def stack(cfgs: Sequence[common_config.RewardCfg]) -> np.ndarray:
+        # Shape (n_models, n_episodes): resampled along the last axis.
+        # Single precision halves the memory traffic of resampling; `pearson_distance_matrix`
+        # upcasts internally, so this only costs the (negligible) rounding of the returns.
+        return np.stack([returns[cfg] for cfg in cfgs]).astype(np.float32, copy=False)
+
+    inputs = [stack(x_reward_cfgs)]
+    if x_reward_cfgs != y_reward_cfgs:
+        inputs.append(stack(y_reward_cfgs))
+    # Otherwise, we are comparing a set of models to itself (the common case): only resample
+    # and standardize the returns once, and compute a symmetric distance matrix.
+
+    n_episodes = inputs[0].shape[1]
+    n_models = sum(x.shape[0] for x in inputs)
+    # Resampled returns are upcast to double precision in `pearson_distance_matrix`.
+    chunk_size = max(1, _BOOTSTRAP_CHUNK_BYTES // (8 * n_models * n_episodes))
+
+    distances = []
+    for start in range(0, n_bootstrap, chunk_size):
+        n_samples = min(chunk_size, n_bootstrap - start)
+        idxs = np.random.randint(n_episodes, size=(n_samples, n_episodes))
+        # Shape (n_samples, n_models, n_episodes).
+        samples = [np.take(x, idxs, axis=1).swapaxes(0, 1) for x in inputs]
+        if rank:
+            # Average ranks of ties, consistent with `scipy.stats.spearmanr`.
+            samples = [scipy.stats.rankdata(x, method="average", axis=-1) for x in samples]
+        distances.append(tabular.pearson_distance_matrix(*samples))
+    distances = np.concatenate(distances)
+
+    lower, middle, upper = util.empirical_ci(distances, alpha, axis=0)
+    lower, middle, upper = lower.ravel(), middle.ravel(), upper.ravel()
+
+    # Row-major order, matching the flattened (nx, ny) confidence interval arrays.
+    pairs = list(itertools.product(x_reward_cfgs, y_reward_cfgs))
+    return {
+        "bootstrap_lower": dict(zip(pairs, lower)),
+        "bootstrap_middle": dict(zip(pairs, middle)),
+        "bootstrap_upper": dict(zip(pairs, upper)),
+        "bootstrap_width": dict(zip(pairs, upper - lower)),
+        "bootstrap_relative": dict(zip(pairs, map(common.relative_error, lower, middle, upper))),
+    }
+
+
 def correlation_distance(
     returns: Mapping[common_config.RewardCfg, np.ndarray],
     x_reward_cfgs: Iterable[common_config.RewardCfg],
     y_reward_cfgs: Iterable[common_config.RewardCfg],
     corr_kind: str,
     n_bootstrap: int,
-    alpha: float = 0.95,
+    alpha: float = 95.0,
 ) -> common_config.AggregatedDistanceReturn:
     """
     Computes correlation of episode returns.
@@ -176,40 +339,26 @@ def correlation_distance(
         y_reward_cfgs: tuples of reward_type and reward_path for y-axis.
         corr_kind: method to compute results, either "pearson" or "spearman".
         n_bootstrap: The number of bootstrap samples to take.
-        alpha: The proportion to give a confidence interval over.
+        alpha: Percentile confidence interval.
 
     Returns:
         Dissimilarity matrix.
     """
-    x_rets = {cfg: returns[cfg] for cfg in x_reward_cfgs}
-    y_rets = {cfg: returns[cfg] for cfg in y_reward_cfgs}
+    x_reward_cfgs = tuple(x_reward_cfgs)
+    y_reward_cfgs = tuple(y_reward_cfgs)
 
     if corr_kind == "pearson":
-        distance_fn = tabular.pearson_distance
+        rank = False
     elif corr_kind == "spearman":
-        distance_fn = tabular.spearman_distance
+        # Spearman's rank correlation coefficient is the Pearson correlation between ranks.
+        rank = True
     else:
         raise ValueError(f"Unrecognized correlation '{corr_kind}'")
 
-    def ci_fn(rewa: np.ndarray, rewb: np.ndarray) -> Mapping[str, float]:
-        distances = util.bootstrap(rewa, rewb, stat_fn=distance_fn, n_samples=n_bootstrap)
-        lower, middle, upper = util.empirical_ci(distances, alpha)
-        return {
-            "bootstrap_lower": lower,
-            "bootstrap_middle": middle,
-            "bootstrap_upper": upper,
-            "bootstrap_width": upper - lower,
-            "bootstrap_relative": common.relative_error(lower, middle, upper),
-        }
-
     logger.info("Computing distance")
-    distance = util.cross_distance(x_rets, y_rets, ci_fn, parallelism=1)
-
-    vals = {}
-    for k1, v1 in distance.items():
-        for k2, v2 in v1.items():
-            vals.setdefault(k2, {})[k1] = v2
-    return vals
+    return _bootstrap_correlation_distance(
+        returns, x_reward_cfgs, y_reward_cfgs, rank, n_bootstrap, alpha
+    )
 
 
 @erc_distance_ex.capture
@@ -221,7 +370,11 @@ def compute_vals(
     trajectory_factory: datasets.TrajectoryFactory,
     trajectory_factory_kwargs: Dict[str, Any],
     n_episodes: int,
+    corr_kind: str,
+    n_bootstrap: int,
+    alpha: float,
     log_dir: str,
+    returns_cache_dir: Optional[str],
 ) -> common_config.AggregatedDistanceReturn:
     """Entry-point into script to produce divergence heatmaps.
 
@@ -234,26 +387,36 @@ def compute_vals(
         trajectory_factory: factory to generate trajectories.
         trajectory_factory_kwargs: arguments to pass to the factory.
         n_episodes: the number of episodes to compute correlation over.
+        corr_kind: method to compute results, either "pearson" or "spearman".
+        n_bootstrap: the number of bootstrap samples to take.
+        alpha: percentile confidence interval.
         log_dir: directory to save data to.
+        returns_cache_dir: directory to cache returns in; if None, do not cache.
 
     Returns:
         Nested dictionary of aggregated distance values.
     """
+    x_reward_cfgs = tuple(x_reward_cfgs)
+    y_reward_cfgs = tuple(y_reward_cfgs)
     models, _, sess = common.load_models_create_sess(
-        env_name, discount, itertools.chain(x_reward_cfgs, y_reward_cfgs)
+        env_name, discount, x_reward_cfgs + y_reward_cfgs
     )
 
     logger.info("Sampling trajectories")
     with trajectory_factory(**trajectory_factory_kwargs) as trajectory_callable:
-        with sess.as_default():
-            returns = batch_compute_returns(trajectory_callable, models, discount, n_episodes)
+        # Exiting the session context closes it, freeing the models' memory before bootstrapping.
+        with sess:
+            returns = batch_compute_returns(
+                trajectory_callable, models, discount, n_episodes, cache_dir=returns_cache_dir
+            )
+    del models, sess
 
     logger.info("Saving episode returns")
     with open(os.path.join(log_dir, "returns.pkl"), "wb") as f:
         pickle.dump(returns, f)
 
-    aggregated = correlation_distance(  # pylint:disable=no-value-for-parameter
-        returns, x_reward_cfgs, y_reward_cfgs
+    aggregated = correlation_distance(
+        returns, x_reward_cfgs, y_reward_cfgs, corr_kind, n_bootstrap, alpha
     )
     return aggregated
 
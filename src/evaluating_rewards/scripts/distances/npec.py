@@ -304,6 +304,7 @@ def compute_npec(  # pylint:disable=unused-argument
 @npec_distance_ex.capture
 def compute_vals(
     ray_kwargs: Mapping[str, Any],
+    num_cpus: int,
     n_seeds: int,
     aggregate_fns: Mapping[str, common.AggregateFn],
     log_dir: str,
@@ -315,6 +316,9 @@ def compute_vals(
     if normalize:
         y_reward_cfgs = list(y_reward_cfgs) + [ZERO_CFG]
 
+    if "num_cpus" in ray_kwargs:
+        # Ray never schedules a seed needing more CPUs than it has: make room for at least one.
+        ray_kwargs = dict(ray_kwargs, num_cpus=max(ray_kwargs["num_cpus"], num_cpus))
     ray.init(**ray_kwargs)
 
     try:
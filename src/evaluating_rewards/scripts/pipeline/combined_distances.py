@@ -21,17 +21,32 @@ or a lineplot (only for timeseries over checkpoints).
 
 # pylint:disable=too-many-lines
 
-import copy
+import collections
+import concurrent.futures
 import functools
-import glob
+import hashlib
 import itertools
+import json
 import logging
+import multiprocessing
 import os
 import pickle
 import re
-from typing import Any, Callable, Iterable, Mapping, Optional, Sequence, Tuple, TypeVar
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
 from imitation.util import util as imit_util
+import matplotlib.lines as mlines
 import matplotlib.patches as mpatches
 import matplotlib.pyplot as plt
 import pandas as pd
@@ -70,6 +85,8 @@ def default_config():
     config_updates = {}  # config updates applied to all subcommands
     named_configs = {}
     skip = {}
+    n_jobs = 1  # number of experiments to run in parallel; None for up to half the CPUs
+    no_cache = True  # if False, reuse (and cache) results of experiments with the same config
     target_reward_type = None
     target_reward_path = None
     pretty_models = {}
@@ -91,6 +108,10 @@ def logging_config(log_root, tag):
         tag,
         imit_util.make_unique_timestamp(),
     )
+    # Results of experiments, keyed by their configuration. Reused across runs unless `no_cache`.
+    cache_dir = os.path.join(  # noqa: F841  pylint:disable=unused-variable
+        log_root, "combined_distances", ".cache"
+    )
 
 
 POINT_MAZE_LEARNED_COMMON = {
@@ -352,15 +373,18 @@ K = TypeVar("K")
 
 
 def common_keys(vals: Iterable[Mapping[K, Any]]) -> Sequence[K]:
-    first = next(iter(vals)).keys()
-    res = set(first)
+    """Keys present in every mapping in `vals`, in the order of the first mapping."""
+    vals = iter(vals)
+    res = dict.fromkeys(next(vals).keys())  # an ordered set: preserves order of first mapping
     for v in vals:
-        res = res.intersection(v.keys())
-    return [k for k in first if k in res]  # preserve order
+        if not res:
+            break
+        res = {k: None for k in res if k in v}
+    return list(res)
 
 
-def _fixed_width_format(x: float, figs: int = 3) -> str:
-    """Format x as a number targeting `figs+1` characters.
+def _fixed_width_format(xs: pd.Series, figs: int = 3) -> pd.Series:
+    """Format each element x of `xs` as a number targeting `figs+1` characters.
 
     This is intended for cramming as much information as possible in a fixed-width
     format. If `x >= 10 ** figs`, then we format it as an integer. Note this will
@@ -370,58 +394,69 @@ def _fixed_width_format(x: float, figs: int = 3) -> str:
     unless `x == 0` in which case we format `x` as "0" exactly.
 
     Args:
-        x: The number to format. The code assumes this is non-negative; the return
-            value may exceed the character target if it is negative.
+        xs: The numbers to format. The code assumes these are non-negative; the return
+            value may exceed the character target for negative numbers.
         figs: The number of digits to target.
 
     Returns:
-        The number formatted as described above.
+        The numbers formatted as described above, with the same index as `xs`.
     """
     smallest_representable = 10 ** (-figs + 1)
-    if 0 < x < 10 ** (-figs + 1):
-        return "<" + str(smallest_representable)
-
-    raw_repr = str(x).replace(".", "")
-    num_leading_zeros = 0
-    for digit in raw_repr:
-        if digit == "0":
-            num_leading_zeros += 1
-        else:
-            break
-    if x >= 10 ** figs:
-        # No decimal point gives us an extra character to use
-        figs += 1
-    fstr = "{:." + str(max(0, figs - num_leading_zeros)) + "g}"
-    res = fstr.format(x)
+    too_small = (0 < xs) & (xs < smallest_representable)
+
+    raw_repr = xs.map(str).astype(object).str.replace(".", "", regex=False)
+    num_leading_zeros = raw_repr.str.len() - raw_repr.str.lstrip("0").str.len()
+    # No decimal point gives us an extra character to use
+    n_figs = figs + (xs >= 10 ** figs).astype(int)
+    precision = (n_figs - num_leading_zeros).clip(lower=0)
+
+    res = pd.Series("", index=xs.index, dtype=object)
+    for prec, idx in xs.groupby(precision).groups.items():
+        res[idx] = xs[idx].map(("{:." + str(prec) + "g}").format)
 
-    delta = (figs + 1) - len(res)
+    delta = (n_figs + 1) - res.str.len()
     # g drops trailing zeros, add them back
-    if delta > 0 and "." in res:
-        res += "0" * delta
-    if delta > 1 and "." not in res:
-        res += "." + "0" * (delta - 1)
+    has_point = res.str.contains(".", regex=False)
+    zeros = pd.Series("0", index=xs.index).str.repeat(delta.clip(lower=0).tolist())
+    res = res.where(~((delta > 0) & has_point), res + zeros)
+    res = res.where(~((delta > 1) & ~has_point), res + "." + zeros.str[1:])
 
-    return res
+    return res.where(~too_small, "<" + str(smallest_representable))
 
 
-def _pretty_label(
-    cfg: common_config.RewardCfg, pretty_mapping: Mapping[str, common_config.RewardCfg]
-) -> str:
-    """Map `cfg` to a more readable label in `pretty_models`.
+def _pretty_labels(
+    cfgs: Iterable[common_config.RewardCfg],
+    pretty_mapping: Mapping[str, common_config.RewardCfg],
+) -> Sequence[str]:
+    """Map each of `cfgs` to a more readable label in `pretty_mapping`.
+
+    The patterns in `pretty_mapping` are compiled once for all of `cfgs`, and grouped by kind so
+    each `cfg` is only matched against patterns of its kind. When Python is run with
+    optimizations (`-O`), we stop at the first match; otherwise, every pattern of the kind is
+    tried, to detect `cfg` matching more than one label.
 
     Raises:
-        ValueError if `cfg` does not match any label in `pretty_models`.
+        ValueError if a member of `cfgs` does not match any label in `pretty_mapping`,
+        or (unless optimizations are enabled) if it matches more than one label.
     """
-    kind, path = cfg
-    label = None
+    compiled = collections.defaultdict(list)
     for search_label, (search_kind, search_pattern) in pretty_mapping.items():
-        if kind == search_kind and re.match(search_pattern, path):
-            if label is not None:
-                raise ValueError(f"Duplicate match for '{cfg}' in '{pretty_mapping}'")
-            label = search_label
-    if label is None:
-        raise ValueError(f"Did not find '{cfg}' in '{pretty_mapping}'")
-    return label
+        compiled[search_kind].append((search_label, re.compile(search_pattern)))
+    labels = []
+    for cfg in cfgs:
+        kind, path = cfg
+        matches = (
+            search_label
+            for search_label, search_pattern in compiled.get(kind, ())
+            if search_pattern.match(path)
+        )
+        label = next(matches, None)
+        if label is None:
+            raise ValueError(f"Did not find '{cfg}' in '{pretty_mapping}'")
+        if __debug__ and next(matches, None) is not None:
+            raise ValueError(f"Duplicate match for '{cfg}' in '{pretty_mapping}'")
+        labels.append(label)
+    return labels
 
 
 def make_table(
@@ -440,43 +475,41 @@ def make_table(
     y_reward_cfgs = common_keys(vals.values())
     experiment_kinds = _get_sorted_experiment_kinds()  # pylint:disable=no-value-for-parameter
 
-    first_row = ""
-    second_row = ""
+    first_row = []
+    second_row = []
     for distance, experiments in experiment_kinds.items():
-        first_row += r" & & \multicolumn{" + str(len(experiments)) + "}{c}{" + distance + "}"
-        second_row += " & & " + " & ".join(experiments)
-    rows = [first_row, second_row]
-
-    for model in y_reward_cfgs:
-        cols = []
-        label = _pretty_label(model, pretty_models)
-        row = f"{label} & & "
-        for distance, experiments in experiment_kinds.items():
-            for visitation in experiments:
-                k = (distance, visitation)
-                if k in vals:
-                    val = vals[k].loc[model]
-                    if distance == "rl":
-                        multiplier = 1
-                    elif key.endswith("relative"):
-                        multiplier = 100
-                    else:
-                        multiplier = 1000
-                    val = val * multiplier
-
-                    col = _fixed_width_format(val)  # fit as many SFs as we can into 4 characters
-                    try:
-                        float(col)
-                        # If we're here, then col is numeric
-                        col = "\\num{" + col + "}"
-                    except ValueError:
-                        pass
-                else:
-                    col = "---"
-                cols.append(col)
-            cols.append("")  # spacer between distance metric groups
-        row += " & ".join(cols[:-1])
-        rows.append(row)
+        first_row.append(r" & & \multicolumn{" + str(len(experiments)) + "}{c}{" + distance + "}")
+        second_row.append(" & & " + " & ".join(experiments))
+    rows = ["".join(first_row), "".join(second_row)]
+
+    # Format each column at once, and then build the rows a column at a time: this vectorizes
+    # over models, rather than looking up each cell in a Python loop.
+    index = pd.MultiIndex.from_tuples(y_reward_cfgs, names=next(iter(vals.values())).index.names)
+    formatted = {}
+    for (distance, visitation), val in vals.items():
+        if distance == "rl":
+            multiplier = 1
+        elif key.endswith("relative"):
+            multiplier = 100
+        else:
+            multiplier = 1000
+        col = _fixed_width_format(val * multiplier)  # fit as many SFs as we can into 4 characters
+        numeric = ~col.str.startswith("<")
+        col = col.where(~numeric, "\\num{" + col + "}")
+        formatted[(distance, visitation)] = col.reindex(index)
+
+    cells = []
+    for distance, experiments in experiment_kinds.items():
+        cells += [(distance, visitation) for visitation in experiments]
+        cells.append(None)  # spacer between distance metric groups
+    row = pd.Series(_pretty_labels(y_reward_cfgs, pretty_models), index=index, dtype=object)
+    row += " & & "
+    for i, cell in enumerate(cells[:-1]):
+        if i > 0:
+            row += " & "
+        if cell is not None:
+            row += formatted[cell] if cell in formatted else "---"
+    rows += row.tolist()
     rows.append("")
     return " \\\\\n".join(rows)
 
@@ -544,12 +577,77 @@ def _input_validation(
                 raise ValueError(f"({dist_key}, {kind}) unconfigured but not skipped.")
 
 
-def load_vals(vals_paths: Sequence[str]) -> Vals:
-    """Loads and combines values from vals_path, recursively searching in subdirectories."""
+def _select_target(vals: Vals, target: common_config.RewardCfg) -> Vals:
+    """Selects only values in `vals` with (canonicalized) target reward `target`."""
+    return {
+        model_key: {
+            table_key: {
+                (tgt, src): v for (tgt, src), v in inner_val.items() if _is_target(tgt, target)
+            }
+            for table_key, inner_val in outer_val.items()
+        }
+        for model_key, outer_val in vals.items()
+    }
+
+
+def _load_val(path: str, target: Optional[common_config.RewardCfg] = None) -> Vals:
+    """Loads values from pickle file `path`, optionally selecting `target`."""
+    # Large buffer: unpickling otherwise issues many small reads for big files.
+    with open(path, "rb", buffering=4 << 20) as f:
+        val = pickle.load(f)
+    if target is not None:
+        val = _select_target(val, target)
+    return val
+
+
+def _iter_vals(
+    pickle_paths: Iterable[str],
+    target: Optional[common_config.RewardCfg] = None,
+    max_workers: int = 8,
+) -> Iterator[Vals]:
+    """Yields values loaded from each of `pickle_paths` in turn, optionally selecting `target`.
+
+    Files are read ahead by up to `max_workers` threads, overlapping IO latency (e.g. on NFS)
+    with the caller's processing. At most `max_workers` loaded values are pending at once.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = collections.deque()
+        for path in pickle_paths:
+            pending.append(executor.submit(_load_val, path, target))
+            if len(pending) >= max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _find_vals_pickles(root: str) -> Iterator[str]:
+    """Yields paths of `vals.pkl` files in `root` or its subdirectories.
+
+    Equivalent to `glob.glob(os.path.join(root, "**", "vals.pkl"), recursive=True)`, including
+    skipping hidden directories, but `os.walk` uses `os.scandir` and so avoids a `stat` call per
+    directory entry.
+    """
+    for dirpath, dirnames, filenames in os.walk(root, followlinks=True):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        if "vals.pkl" in filenames:
+            yield os.path.join(dirpath, "vals.pkl")
+
+
+def load_vals(vals_paths: Sequence[str], target: Optional[common_config.RewardCfg] = None) -> Vals:
+    """Loads and combines values from vals_path, recursively searching in subdirectories.
+
+    Args:
+        vals_paths: Paths to pickle files, or directories to search for `vals.pkl` files in.
+        target: If specified, discard values whose target reward is not `target` as each file is
+            loaded, rather than keeping all values in memory until `filter_values`.
+
+    Returns:
+        The values from all files, recursively merged.
+    """
     pickle_paths = []
     for path in vals_paths:
         if os.path.isdir(path):
-            nested_paths = glob.glob(os.path.join(path, "**", "vals.pkl"), recursive=True)
+            nested_paths = list(_find_vals_pickles(path))
             if not nested_paths:
                 raise ValueError(f"No 'vals.pkl' files found in {path}")
             pickle_paths += nested_paths
@@ -557,24 +655,146 @@ def load_vals(vals_paths: Sequence[str]) -> Vals:
             pickle_paths.append(path)
 
     vals = {}
-    for path in pickle_paths:
-        with open(path, "rb") as f:
-            val = pickle.load(f)
+    for val in _iter_vals(pickle_paths, target):
         script_utils.recursive_dict_merge(vals, val)
+        # Free any values not merged into `vals` before loading the next file.
+        del val
 
     return vals
 
 
+def _dup(d: Mapping[K, Any]) -> Mapping[K, Any]:
+    """Copies every level of nested dicts `d`, so they can be merged without aliasing.
+
+    Cheaper than `copy.deepcopy`: leaves are not copied, which suffices since
+    `script_utils.recursive_dict_merge` only mutates dicts, replacing leaves.
+    """
+    return {k: _dup(v) if isinstance(v, dict) else v for k, v in d.items()}
+
+
+def _save_vals_shard(log_dir: str, key: Tuple[str, str], result: Any) -> None:
+    """Saves the values `{key: result}` of one experiment to `vals.pkl` in its log directory.
+
+    `load_vals` merges every `vals.pkl` under a directory, so the whole run can be loaded by
+    passing `log_dir`, or a subset of experiments by passing their subdirectories.
+    """
+    dist_key, kind = key
+    path = os.path.join(log_dir, dist_key, kind, "vals.pkl")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        pickle.dump({key: result}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _cache_key_default(x: Any) -> str:
+    """Encodes `x`, which `json` cannot encode natively, for `_distance_cache_path`.
+
+    Module-level functions and classes are encoded by their qualified name. Anything else
+    (e.g. a lambda, or an object whose `str` includes its address) has no stable encoding.
+
+    Raises:
+        TypeError if `x` cannot be encoded.
+    """
+    qualname = getattr(x, "__qualname__", None)
+    if callable(x) and qualname is not None and "<" not in qualname:
+        return f"{x.__module__}.{qualname}"
+    raise TypeError(f"Cannot derive a cache key from '{x!r}': set `no_cache=True`.")
+
+
+def _distance_cache_path(
+    cache_dir: str,
+    dist_key: str,
+    config_updates: Mapping[str, Any],
+    named_configs: Sequence[str],
+) -> str:
+    """Path in `cache_dir` to cache the result of `_run_distance` with these arguments.
+
+    The file name is a digest of the arguments and the output directory that reward models
+    and policies are loaded from. It excludes `log_dir`: that only determines where the
+    experiment writes its logs, not the result. It does not capture the contents of named
+    configs or of checkpoints, so the cache must be cleared when those change.
+
+    Raises:
+        TypeError if a value in `config_updates` cannot be encoded: see `_cache_key_default`.
+    """
+    config_updates = {k: v for k, v in config_updates.items() if k != "log_dir"}
+    payload = {
+        "ex": dist_key,
+        "updates": config_updates,
+        "named": list(named_configs),
+        "output_dir": serialize.get_output_dir(),
+    }
+    payload = json.dumps(payload, sort_keys=True, default=_cache_key_default)
+    key = hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+    return os.path.join(cache_dir, f"{dist_key}-{key}.pkl")
+
+
+class _DistanceTask(NamedTuple):
+    """Arguments to `_run_distance` for one experiment, in the order it takes them."""
+
+    dist_key: str
+    config_updates: Mapping[str, Any]
+    named_configs: Sequence[str]
+    cache_path: Optional[str]
+
+
+def _run_distance(
+    dist_key: str,
+    config_updates: Mapping[str, Any],
+    named_configs: Sequence[str],
+    cache_path: Optional[str] = None,
+) -> Any:
+    """Runs distance experiment `dist_key`, returning its result.
+
+    Takes the key rather than the experiment itself so it can be run in a worker process.
+    If `cache_path` is specified, the result is saved there.
+    """
+    run = DISTANCE_EXS[dist_key].run(config_updates=config_updates, named_configs=named_configs)
+    if cache_path is not None:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(run.result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    return run.result
+
+
+def _limit_cpus(
+    dist_key: str, config_updates: Mapping[str, Any], num_cpus: int
+) -> Mapping[str, Any]:
+    """Caps the CPUs used by distance experiment `dist_key` at `num_cpus`.
+
+    Used when running experiments in parallel: otherwise each would size its own worker pool
+    to the whole machine. ERC is limited to `num_cpus` environments, and EPIC and NPEC start
+    Ray with `num_cpus` CPUs; the CPUs reserved by each of their seeds are left unchanged.
+    The cap overrides any values set by named configs, but not those in `config_updates`.
+    """
+    if dist_key == "erc":
+        limits = {"trajectory_factory_kwargs": {"n_envs": num_cpus}}
+    elif dist_key in ("epic", "npec"):
+        limits = {"ray_kwargs": {"num_cpus": num_cpus}}
+    else:
+        # Each RL worker reserves CPUs in proportion to `num_vec`, which determines the result,
+        # so lowering Ray's CPU count could leave workers unschedulable.
+        return config_updates
+    return script_utils.recursive_dict_merge(limits, config_updates, overwrite=True)
+
+
 @combined_distances_ex.capture
 def compute_vals(
     config_updates: Mapping[str, Any],
     named_configs: Mapping[str, Mapping[str, Any]],
     skip: Mapping[str, Mapping[str, bool]],
+    n_jobs: Optional[int],
+    cache_dir: str,
+    no_cache: bool,
     log_dir: str,
 ) -> Vals:
     """
     Run experiments to compute distance values.
 
+    The values of each experiment are saved to `vals.pkl` in its log directory as soon as they
+    are available, rather than all at once after every experiment has finished.
+
     Args:
         config_updates: Config updates to apply. Hierarchically specified by algorithm and
             experiment kind. "global" may be specified at top-level (applies to all algorithms)
@@ -586,39 +806,98 @@ def compute_vals(
             using `recursive_dict_merge`.
         skip: If `skip[ex_key][kind]` is True, then skip that experiment (e.g. if a metric
             does not support a particular configuration).
+        n_jobs: The number of experiments to run in parallel, each in its own process.
+            If None, one per experiment, up to half the number of CPUs (experiments are often
+            multi-threaded themselves, e.g. TensorFlow ops). If greater than one, the CPUs are
+            split evenly between experiments: see `_limit_cpus`. Devices are not split: each
+            process opens its own TensorFlow session, which may claim the whole of any GPU.
+        cache_dir: Directory to cache the result of each experiment in, keyed by its
+            configuration. Cached results are loaded rather than rerunning the experiment.
+        no_cache: If True, do not read from or write to `cache_dir`.
         log_dir: The directory to write tables and other logging to.
     """
     experiment_kinds = _get_sorted_experiment_kinds()  # pylint:disable=no-value-for-parameter
-    res = {}
+    tasks = {}
+    merge = functools.partial(script_utils.recursive_dict_merge, overwrite=True)
     for dist_key, experiments in experiment_kinds.items():
-        dist_ex = DISTANCE_EXS[dist_key]
+        # Merge the updates and named configs common to all experiment kinds once per `dist_key`.
+        dist_updates = merge(
+            _dup(config_updates.get("global", {})),
+            _dup(config_updates.get(dist_key, {}).get("global", {})),
+        )
+        dist_named = tuple(named_configs.get("global", ()))
+        dist_named += tuple(named_configs.get(dist_key, {}).get("global", ()))
+
         for kind in experiments:
             if kind in skip.get(dist_key, ()):
                 logger.info(f"Skipping ({dist_key}, {kind})")
                 continue
 
-            local_updates = [
-                config_updates.get("global", {}),
-                config_updates.get(dist_key, {}).get("global", {}),
-                config_updates.get(dist_key, {}).get(kind, {}),
-            ]
-            local_updates = [copy.deepcopy(cfg) for cfg in local_updates]
-            local_updates = functools.reduce(
-                functools.partial(script_utils.recursive_dict_merge, overwrite=True),
-                local_updates,
+            # Copy: merging mutates the destination, and may alias subdicts of the source into it.
+            local_updates = merge(
+                _dup(dist_updates), _dup(config_updates.get(dist_key, {}).get(kind, {}))
             )
 
             if "log_dir" in local_updates:
                 raise ValueError("Cannot override `log_dir`.")
             local_updates["log_dir"] = os.path.join(log_dir, dist_key, kind)
 
-            local_named = tuple(named_configs.get("global", ()))
-            local_named += tuple(named_configs.get(dist_key, {}).get("global", ()))
-            local_named += tuple(named_configs.get(dist_key, {}).get(kind, ()))
+            local_named = dist_named + tuple(named_configs.get(dist_key, {}).get(kind, ()))
 
-            logger.info(f"Running ({dist_key}, {kind}): {local_updates} plus {local_named}")
-            run = dist_ex.run(config_updates=local_updates, named_configs=local_named)
-            res[(dist_key, kind)] = run.result
+            cache_path = None
+            if not no_cache:
+                cache_path = _distance_cache_path(cache_dir, dist_key, local_updates, local_named)
+            tasks[(dist_key, kind)] = _DistanceTask(
+                dist_key, local_updates, local_named, cache_path
+            )
+
+    order = list(tasks.keys())
+    res = {}
+    if not no_cache:
+        for key, task in list(tasks.items()):
+            if os.path.exists(task.cache_path):
+                logger.info(f"Loading cached {key} from '{task.cache_path}'")
+                with open(task.cache_path, "rb") as f:
+                    res[key] = pickle.load(f)
+                _save_vals_shard(log_dir, key, res[key])
+                del tasks[key]
+
+    if n_jobs is None:
+        n_jobs = min(len(tasks), os.cpu_count() // 2)
+
+    if n_jobs <= 1:
+        for key, task in tasks.items():
+            logger.info(f"Running {key}: {task.config_updates} plus {task.named_configs}")
+            res[key] = _run_distance(*task)
+            _save_vals_shard(log_dir, key, res[key])
+    else:
+        # The experiments are independent, so run them in parallel. Spawn (rather than fork)
+        # worker processes: TensorFlow and Ray are not fork-safe once initialized.
+        mp_context = multiprocessing.get_context("spawn")
+        # Split the CPUs between experiments. Applied after computing `cache_path`, since it
+        # only changes how an experiment is run, not its result.
+        cpus_per_job = max(1, os.cpu_count() // n_jobs)
+        for key, task in tasks.items():
+            updates = _limit_cpus(task.dist_key, task.config_updates, cpus_per_job)
+            tasks[key] = task._replace(config_updates=updates)
+        with concurrent.futures.ProcessPoolExecutor(n_jobs, mp_context=mp_context) as executor:
+            futures = {}
+            for key, task in tasks.items():
+                logger.info(f"Submitting {key}: {task.config_updates} plus {task.named_configs}")
+                futures[executor.submit(_run_distance, *task)] = key
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    key = futures[future]
+                    res[key] = future.result()
+                    logger.info(f"Completed {key}")
+                    _save_vals_shard(log_dir, key, res[key])
+            except BaseException:
+                # Fail fast: don't start any experiments still queued.
+                for future in futures:
+                    future.cancel()
+                raise
+    # Preserve the order of `experiment_kinds` in `res`.
+    res = {key: res[key] for key in order}
 
     return res
 
@@ -628,6 +907,17 @@ def _canonicalize_cfg(cfg: common_config.RewardCfg) -> common_config.RewardCfg:
     return kind, results.canonicalize_data_root(path)
 
 
+def _is_target(
+    cfg: common_config.RewardCfg,
+    target: common_config.RewardCfg,
+    canonicalize_cfg: Callable[[common_config.RewardCfg], common_config.RewardCfg] = (
+        _canonicalize_cfg
+    ),
+) -> bool:
+    """Is `cfg` equal to `target` once canonicalized? Checks the (cheap) type first."""
+    return cfg[0] == target[0] and canonicalize_cfg(cfg) == target
+
+
 @combined_distances_ex.capture
 def filter_values(
     vals: Vals,
@@ -650,17 +940,25 @@ def filter_values(
         a particular visitation distribution).
 
     """
+    target = (target_reward_type, target_reward_path)
+    # The same handful of paths recur across every (model_key, table_key), so memoize.
+    # Cache is local to this call: canonicalization depends on the output dir env var.
+    canonicalize_cfg = functools.lru_cache(maxsize=None)(_canonicalize_cfg)
     vals_filtered = {}
     for model_key, outer_val in vals.items():
         for table_key, inner_val in outer_val.items():
+            # Only canonicalize (and convert to a Series) the values for the target reward.
             inner_val = {
-                (_canonicalize_cfg(target), _canonicalize_cfg(source)): v
-                for (target, source), v in inner_val.items()
+                (target, canonicalize_cfg(source)): v
+                for (cfg, source), v in inner_val.items()
+                if _is_target(cfg, target, canonicalize_cfg)
             }
+            if not inner_val:
+                raise KeyError(f"Target '{target}' not in values for '{model_key}', '{table_key}'")
             inner_val = aggregated.oned_mapping_to_series(inner_val)
-            vals_filtered.setdefault(table_key, {})[model_key] = inner_val.xs(
-                key=(target_reward_type, target_reward_path),
-                level=("target_reward_type", "target_reward_path"),
+            # Every entry is for the target, so drop those levels rather than selecting with `xs`.
+            vals_filtered.setdefault(table_key, {})[model_key] = inner_val.droplevel(
+                ["target_reward_type", "target_reward_path"]
             )
     return vals_filtered
 
@@ -681,39 +979,29 @@ def latex_table(
         log_dir: Directory to write table to.
     """
     for k, v in vals_filtered.items():
-        v = vals_filtered[k]
         path = os.path.join(log_dir, f"{k}.csv")
         logger.info(f"Writing table to '{path}'")
-        with open(path, "wb") as f:
-            table = make_table(k, v, pretty_models)
-            f.write(table.encode())
-
-
-def _checkpoint_to_progress(df: pd.DataFrame) -> pd.DataFrame:
-    ckpts = df["Checkpoint"].astype("int")
-    if len(ckpts) == 1:
-        progress = ckpts * 0.0
-    else:
-        progress = ckpts * 100 / ckpts.max()
-
-    return progress
+        table = make_table(k, v, pretty_models)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(table)
 
 
 def _add_label_and_progress(
     s: pd.Series, pretty_models: Mapping[str, common_config.RewardCfg]
 ) -> pd.DataFrame:
-    """Add pretty label and checkpoint progress to reward distances."""
-    labels = s.index.map(functools.partial(_pretty_label, pretty_mapping=pretty_models))
+    """Add pretty label and checkpoint progress to reward distances.
+
+    Progress is the checkpoint as a percentage of the last checkpoint for that reward label,
+    or zero if there is only a single checkpoint for that reward label.
+    """
     df = s.reset_index(name="Distance")
+    labels = _pretty_labels(zip(df["source_reward_type"], df["source_reward_path"]), pretty_models)
 
     regex = ".*/checkpoints/(?P<Checkpoint>final|[0-9]+)(?:/.*)?$"
-    match = df["source_reward_path"].str.extract(regex)
-    match["Reward"] = labels
-
-    grp = match.groupby("Reward")
-    progress = grp.apply(_checkpoint_to_progress)
-    progress = progress.reset_index("Reward", drop=True)
-    df["Progress"] = progress
+    ckpts = df["source_reward_path"].str.extract(regex)["Checkpoint"].astype("int")
+    grp = ckpts.groupby(labels)
+    progress = ckpts * 100 / grp.transform("max")
+    df["Progress"] = progress.where(grp.transform("size") > 1, 0.0)
     df["Reward"] = labels
 
     return df
@@ -736,9 +1024,9 @@ def _timeseries_distances(
     pretty_models: Mapping[str, common_config.RewardCfg],
 ) -> pd.DataFrame:
     """Merge vals into a single DataFrame, adding label and progress."""
+    labels = _pretty_labels(vals.keys(), pretty_algorithms)
     vals = {
-        _pretty_label(k, pretty_algorithms): _add_label_and_progress(v, pretty_models)
-        for k, v in vals.items()
+        label: _add_label_and_progress(v, pretty_models) for label, v in zip(labels, vals.values())
     }
     df = pd.concat(vals, names=("Algorithm", "Original"))
     df = df.reset_index().drop(columns=["Original"])
@@ -753,29 +1041,6 @@ def _timeseries_distances(
     return df
 
 
-class CustomCILinePlotter(sns.relational._LinePlotter):  # pylint:disable=protected-access
-    """
-    LinePlotter supporting custom confidence interval width.
-
-    This is unfortunately entangled with seaborn internals so may break with seaborn upgrades.
-    """
-
-    def __init__(self, lower, upper, **kwargs):
-        super().__init__(**kwargs)
-        self.lower = lower
-        self.upper = upper
-        self.estimator = "dummy"
-
-    def aggregate(self, vals, grouper, units=None):
-        y_ci = pd.DataFrame(
-            {
-                "low": self.lower.loc[vals.index, "Distance"],
-                "high": self.upper.loc[vals.index, "Distance"],
-            }
-        )
-        return grouper, vals, y_ci
-
-
 def flip(items, ncol):
     return itertools.chain(*[items[i::ncol] for i in range(ncol)])
 
@@ -818,6 +1083,27 @@ _COLOR_PALETTES = {
     "Algorithm": "Set2",
     "Reward": "deep",
 }
+# Dash patterns for successive levels of the style key (same as seaborn's defaults).
+_DASHES = [(), (4, 1.5), (1, 1), (3, 1.25, 1.5, 1.25), (5, 1, 1, 1)]
+
+
+def _line_styles(
+    data: pd.DataFrame, hue_col: str, style_col: str
+) -> Tuple[Mapping[str, Any], Mapping[str, Any]]:
+    """Maps categories of `hue_col` to colors, and categories of `style_col` to linestyles.
+
+    Every category of the data type is mapped, not just those present in `data`, so that
+    colors and linestyles are consistent between plots of different subsets of the data.
+    """
+    hue_levels = data[hue_col].dtype.categories
+    palette = sns.color_palette(_COLOR_PALETTES[hue_col], len(hue_levels))
+    colors = dict(zip(hue_levels, palette))
+    style_levels = data[style_col].dtype.categories
+    linestyles = {
+        level: (0, dashes) if dashes else "-"
+        for level, dashes in zip(style_levels, itertools.cycle(_DASHES))
+    }
+    return colors, linestyles
 
 
 def custom_ci_line_plot(
@@ -827,9 +1113,12 @@ def custom_ci_line_plot(
     hue_col: str,
     style_col: str,
     ax: plt.Axes,
-) -> CustomCILinePlotter:
+) -> None:
     """Like `sns.lineplot`, but supporting custom confidence intervals.
 
+    Plots each group directly with matplotlib, rather than going through seaborn's
+    (private, and much slower) `_LinePlotter` machinery.
+
     Args:
         mid: Data of mid point.
         lower: Data of lower point.
@@ -837,55 +1126,54 @@ def custom_ci_line_plot(
         hue_col: Column to group with (by hue, i.e. line color).
         style_col: Column to group with (by linestyle).
         ax: Axes to plot on.
-
-    Returns:
-        The plotter object.
     """
-    variables = sns.relational._LinePlotter.get_semantics(  # pylint:disable=protected-access
-        dict(x="Progress", y="Distance", hue=hue_col, style=style_col, size=None, units=None),
-    )
-    plotter = CustomCILinePlotter(
-        variables=variables,
-        data=mid,
-        lower=lower,
-        upper=upper,
-        legend=None,
-        err_style="band",
-    )
-    palette = sns.color_palette(_COLOR_PALETTES[hue_col], len(mid[hue_col].dtype.categories))
-    plotter.map_hue(palette=palette, order=None, norm=None)  # pylint:disable=no-member
-    plotter.map_size(sizes=None, order=None, norm=None)  # pylint:disable=no-member
-    plotter.map_style(markers=False, dashes=True, order=None)  # pylint:disable=no-member
-    plotter._attach(ax)  # pylint:disable=protected-access
-    plotter.plot(ax, {})
-    return plotter
+    colors, linestyles = _line_styles(mid, hue_col, style_col)
+    group_cols = list(dict.fromkeys([hue_col, style_col]))
+    for _, group in mid.groupby(group_cols, observed=True):
+        group = group.sort_values(["Progress", "Distance"])
+        color = colors[group[hue_col].iat[0]]
+        linestyle = linestyles[group[style_col].iat[0]]
+        x = group["Progress"].to_numpy()
+        ax.plot(x, group["Distance"].to_numpy(), color=color, linestyle=linestyle)
+        ax.fill_between(
+            x,
+            lower.loc[group.index, "Distance"].to_numpy(),
+            upper.loc[group.index, "Distance"].to_numpy(),
+            color=color,
+            alpha=0.2,
+            linewidth=0,
+        )
 
 
 def _make_distance_over_time_plot_legend(
-    plotter: CustomCILinePlotter,
+    data: pd.DataFrame,
     fig: plt.Figure,
     ax: plt.Axes,
     hue_col: str,
     style_col: str,
 ) -> None:
-    """Add legend to distance over time plot."""
-    plotter.add_legend_data(ax)
-    handles, labels = ax.get_legend_handles_labels()
+    """Add legend to distance over time plot of `data`."""
+    colors, linestyles = _line_styles(data, hue_col, style_col)
     if hue_col == style_col:
-        # Only one key, so legend can fit into one row.
+        # Only one key, so legend can fit into one row: a (blank) subtitle, then each level.
+        handles = [mlines.Line2D([], [], linewidth=0)]
+        handles += [mlines.Line2D([], [], color=colors[k], linestyle=linestyles[k]) for k in colors]
+        labels = [hue_col] + list(colors)
         ncol = len(handles)
     else:
         # Different keys. Legend needs two rows.
+        handles = [mlines.Line2D([], [], color=color) for color in colors.values()]
+        handles += [
+            mlines.Line2D([], [], color=".2", linestyle=linestyle)
+            for linestyle in linestyles.values()
+        ]
+        labels = list(colors) + list(linestyles)
 
         # Make number of columns large enough to fit hue and style each in one row.
-        n_hue = len(plotter.lower[hue_col].dtype.categories)
-        n_style = len(plotter.lower[style_col].dtype.categories)
+        n_hue = len(colors)
+        n_style = len(linestyles)
         ncol = max(n_hue, n_style)
 
-        # Delete subtitles
-        del handles[0], labels[0]  # delete hue subtitle
-        del handles[n_hue], labels[n_hue]  # delete style subtitle
-
         # Pad the smaller row, if they're different length, so its entries are centered
         if n_hue > n_style:
             larger_handles, larger_labels = handles[:n_hue], labels[:n_hue]
@@ -954,9 +1242,10 @@ def _make_distance_over_time_plot(
     mid_rl, lower_rl, upper_rl = vals_rl
 
     fig, ax = plt.subplots(1, 1)
-    plotter = None
+    legend_data = None
     if not mid_dist.empty:
-        plotter = custom_ci_line_plot(mid_dist, lower_dist, upper_dist, hue_col, style_col, ax)
+        legend_data = mid_dist
+        custom_ci_line_plot(mid_dist, lower_dist, upper_dist, hue_col, style_col, ax)
         ax.set_ylabel("Distance")
         _, y_high = ax.get_ylim()
         ax.set_ylim(0, y_high)
@@ -965,7 +1254,8 @@ def _make_distance_over_time_plot(
             rl_ax = ax
         else:
             rl_ax = ax.twinx()
-        plotter = custom_ci_line_plot(mid_rl, lower_rl, upper_rl, hue_col, style_col, rl_ax)
+        legend_data = mid_rl
+        custom_ci_line_plot(mid_rl, lower_rl, upper_rl, hue_col, style_col, rl_ax)
         rl_ax.set_ylabel("Regret")
 
     if filter_col == "Reward":
@@ -976,7 +1266,7 @@ def _make_distance_over_time_plot(
     x_label += " Training Progress (%)"
     ax.set_xlabel(x_label)
 
-    _make_distance_over_time_plot_legend(plotter, fig, ax, hue_col, style_col)
+    _make_distance_over_time_plot_legend(legend_data, fig, ax, hue_col, style_col)
 
     return fig
 
@@ -1025,13 +1315,17 @@ def combined_distances(
     log_dir: str,
     named_configs: Mapping[str, Mapping[str, Any]],
     output_fn: Callable[[ValsFiltered], None],
+    target_reward_type: str,
+    target_reward_path: str,
 ) -> None:
     """Entry-point into CLI script.
 
     Args:
         vals_paths: Paths to precomputed values to tabulate. Skips everything but table generation
             if non-empty. This is useful for regenerating tables in a new style from old data,
-            including combining results from multiple previous runs.
+            including combining results from multiple previous runs. A directory is searched
+            recursively for `vals.pkl` files, such as the per-experiment files saved to `log_dir`
+            by a previous run.
         log_dir: The directory to write tables and other logging to.
         named_configs: Named configs to apply. First key is a namespace which has no semantic
             meaning, but should be unique for each Sacred config scope. Second key is the algorithm
@@ -1039,22 +1333,22 @@ def combined_distances(
             are tuples of named configs. The dicts across namespaces are recursively merged
             using `recursive_dict_merge`.
         output_fn: Function to call to generate saved output.
+        target_reward_type: The target reward type to output distance from.
+        target_reward_path: The target reward path to output distance from.
     """
     # Merge named_configs. We have a faux top-level layer to workaround Sacred being unable to
     # have named configs build on top of each others definitions in a particular order.
-    named_configs = [copy.deepcopy(cfg) for cfg in named_configs.values()]
+    named_configs = [_dup(cfg) for cfg in named_configs.values()]
     named_configs = functools.reduce(script_utils.recursive_dict_merge, named_configs)
 
     _input_validation(named_configs=named_configs)  # pylint:disable=no-value-for-parameter
 
     if vals_paths:
-        vals = load_vals(vals_paths)
+        vals = load_vals(vals_paths, target=(target_reward_type, target_reward_path))
     else:
+        # Saves values for each experiment under `log_dir`, which `load_vals` can read back.
         vals = compute_vals(named_configs=named_configs)  # pylint:disable=no-value-for-parameter
 
-        with open(os.path.join(log_dir, "vals.pkl"), "wb") as f:
-            pickle.dump(vals, f)
-
     # TODO(adam): how to get generator reward? that might be easiest as side-channel.
     # or separate script, which you could potentially combine here.
     vals_filtered = filter_values(vals)  # pylint:disable=no-value-for-parameter
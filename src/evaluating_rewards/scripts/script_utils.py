@@ -71,7 +71,11 @@ def recursive_dict_merge(
     path: Optional[Iterable[str]] = None,
     overwrite: bool = False,
 ) -> MutableMapping[K, V]:
-    """Merges update_by into dest recursively."""
+    """Merges update_by into dest recursively.
+
+    Sequences present in both are merged into a tuple of their union, sorted so that the result
+    does not depend on the hash seed.
+    """
     if path is None:
         path = []
     for key in update_by:
@@ -81,7 +85,8 @@ def recursive_dict_merge(
                     dest[key], update_by[key], path + [str(key)], overwrite=overwrite
                 )
             elif isinstance(dest[key], (tuple, list)) and isinstance(update_by[key], (tuple, list)):
-                dest[key] = tuple(set(dest[key]).union(update_by[key]))
+                union = set(dest[key]).union(update_by[key])
+                dest[key] = tuple(sorted(union, key=repr))  # `repr` orders mixed types
             elif dest[key] == update_by[key]:
                 pass  # same leaf value
             elif overwrite:
@@ -0,0 +1,117 @@
+# Copyright 2020 Adam Gleave
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for evaluating_rewards.scripts.pipeline.combined_distances."""
+
+# pylint:disable=protected-access
+
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+import pytest
+
+from evaluating_rewards.distances import tabular
+from evaluating_rewards.scripts.pipeline import combined_distances
+
+FIXED_WIDTH_FORMAT_CASES = {
+    0.0: "0.00",
+    0.001: "<0.01",
+    0.0099: "<0.01",
+    0.01: "0.01",
+    0.5: "0.50",
+    3.14159: "3.14",
+    42.0: "42.0",
+    999.0: "999",
+    999.9: "1e+03",
+    1000.0: "1000",
+    1234.5: "1234",
+    12345.0: "1.234e+04",
+    -0.001: "-0.001",
+    -0.5: "-0.5",
+    -1234.0: "-1.23e+03",
+    float("nan"): "nan",
+}
+
+# Merges sequences as `compute_vals` does, then prints their cache path.
+CACHE_PATH_SCRIPT = """
+from evaluating_rewards.scripts import script_utils
+from evaluating_rewards.scripts.pipeline import combined_distances
+
+named = script_utils.recursive_dict_merge({"global": tuple("abcdef")}, {"global": tuple("ghij")})
+updates = script_utils.recursive_dict_merge({"xs": ("foo", "bar")}, {"xs": ("baz", "qux")})
+print(combined_distances._distance_cache_path("cache", "epic", updates, named["global"]))
+"""
+
+
+def test_fixed_width_format():
+    """Tests `_fixed_width_format` output for representative numbers, preserving the index."""
+    xs = pd.Series(
+        list(FIXED_WIDTH_FORMAT_CASES.keys()), index=range(10, 10 + len(FIXED_WIDTH_FORMAT_CASES))
+    )
+    expected = pd.Series(list(FIXED_WIDTH_FORMAT_CASES.values()), index=xs.index)
+    pd.testing.assert_series_equal(
+        combined_distances._fixed_width_format(xs), expected, check_dtype=False
+    )
+
+
+def test_distance_cache_path_hash_seed():
+    """Tests the cache path of merged configs does not depend on `PYTHONHASHSEED`."""
+    paths = set()
+    for seed in range(4):
+        proc = subprocess.run(
+            [sys.executable, "-c", CACHE_PATH_SCRIPT],
+            env=dict(os.environ, PYTHONHASHSEED=str(seed)),
+            check=True,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        paths.add(proc.stdout)
+    assert len(paths) == 1
+
+
+def test_distance_cache_path_order():
+    """Tests the cache path distinguishes order-significant sequences and encodes functions."""
+    cfgs = {"x_reward_cfgs": [("kind", "path")], "fn": tabular.pearson_distance}
+    swapped = {"x_reward_cfgs": [("path", "kind")], "fn": tabular.pearson_distance}
+    path = combined_distances._distance_cache_path("cache", "epic", cfgs, ["a", "b"])
+    assert path == combined_distances._distance_cache_path("cache", "epic", cfgs, ["a", "b"])
+    assert path != combined_distances._distance_cache_path("cache", "epic", swapped, ["a", "b"])
+    assert path != combined_distances._distance_cache_path("cache", "epic", cfgs, ["b", "a"])
+    with pytest.raises(TypeError, match="Cannot derive a cache key"):
+        combined_distances._distance_cache_path("cache", "epic", {"fn": lambda x: x}, [])
+
+
+def test_compute_vals_cache(monkeypatch):
+    """Tests results cached by one run are loaded, unchanged, by the next."""
+    ex = combined_distances.combined_distances_ex
+    with tempfile.TemporaryDirectory(prefix="eval-rewards-exp") as tmpdir:
+        config_updates = {"log_root": tmpdir, "no_cache": False}
+        first = ex.run(named_configs=["test"], config_updates=config_updates)
+        assert os.listdir(first.config["cache_dir"])
+
+        def _run_distance(*args, **kwargs):
+            raise AssertionError(f"Cache miss: ran {args}, {kwargs}")
+
+        monkeypatch.setattr(combined_distances, "_run_distance", _run_distance)
+        second = ex.run(named_configs=["test"], config_updates=config_updates)
+        assert second.status == "COMPLETED"
+
+        first_vals = combined_distances.load_vals([first.config["log_dir"]])
+        second_vals = combined_distances.load_vals([second.config["log_dir"]])
+    assert first_vals.keys() == second_vals.keys()
+    for key, val in first_vals.items():
+        assert pd.DataFrame(val).equals(pd.DataFrame(second_vals[key]))
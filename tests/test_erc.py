@@ -0,0 +1,83 @@
+# Copyright 2020 Adam Gleave
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for evaluating_rewards.scripts.distances.erc."""
+
+# pylint:disable=protected-access
+
+import numpy as np
+import pytest
+import scipy.stats
+
+from evaluating_rewards.analysis import util
+from evaluating_rewards.distances import tabular
+from evaluating_rewards.scripts.distances import common, erc
+
+CFGS = [("kind", "a"), ("kind", "b"), ("other", "a"), ("other", "ties")]
+
+
+def _spearman_distance(rewa: np.ndarray, rewb: np.ndarray) -> float:
+    corr, _ = scipy.stats.spearmanr(rewa, rewb)
+    return np.sqrt(0.5 * (1 - corr))
+
+
+@pytest.mark.parametrize("rank", [False, True])
+@pytest.mark.parametrize("symmetric", [False, True])
+def test_bootstrap_correlation_distance(rank: bool, symmetric: bool) -> None:
+    """Tests batched bootstrap agrees with bootstrapping each pair with `cross_distance`."""
+    n_episodes, n_bootstrap, alpha = 64, 16, 95.0
+    rng = np.random.RandomState(seed=42)
+    returns = {cfg: rng.standard_normal(n_episodes) for cfg in CFGS}
+    returns[("other", "ties")] = np.round(returns[("other", "ties")])
+    x_reward_cfgs = tuple(CFGS)
+    y_reward_cfgs = x_reward_cfgs if symmetric else x_reward_cfgs[1:3]
+
+    np.random.seed(0)
+    actual = erc._bootstrap_correlation_distance(
+        returns, x_reward_cfgs, y_reward_cfgs, rank, n_bootstrap, alpha
+    )
+    # Same episodes as resampled above, since they fit in a single chunk.
+    np.random.seed(0)
+    idxs = np.random.randint(n_episodes, size=(n_bootstrap, n_episodes))
+
+    # Bootstrap each pair separately, as `correlation_distance` did before batching.
+    distance_fn = _spearman_distance if rank else tabular.pearson_distance
+
+    def ci_fn(rewa, rewb):
+        distances = [distance_fn(rewa[idx], rewb[idx]) for idx in idxs]
+        lower, middle, upper = util.empirical_ci(distances, alpha)
+        return {
+            "bootstrap_lower": lower,
+            "bootstrap_middle": middle,
+            "bootstrap_upper": upper,
+            "bootstrap_width": upper - lower,
+            "bootstrap_relative": common.relative_error(lower, middle, upper),
+        }
+
+    x_rets = {cfg: returns[cfg] for cfg in x_reward_cfgs}
+    y_rets = {cfg: returns[cfg] for cfg in y_reward_cfgs}
+    distance = util.cross_distance(x_rets, y_rets, ci_fn, parallelism=1)
+    expected = {}
+    for k1, v1 in distance.items():
+        for k2, v2 in v1.items():
+            expected.setdefault(k2, {})[k1] = v2
+
+    assert actual.keys() == expected.keys()
+    for stat, vals in expected.items():
+        assert list(actual[stat].keys()) == list(vals.keys())
+        for pair, val in vals.items():
+            if stat == "bootstrap_relative" and pair[0] == pair[1]:
+                continue  # relative to a zero distance: dominated by rounding error
+            # Returns are resampled in single precision.
+            assert np.allclose(actual[stat][pair], val, atol=1e-5), (stat, pair)
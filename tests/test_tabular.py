@@ -192,3 +192,57 @@ def test_canonical_dist_near_zero(deshape_fn: tabular.DeshapeFn, shaped_pair) ->
     # Since it is equivalent to zero, it is also equivalent to the negative of itself!
     dist_opposite = tabular.canonical_reward_distance(zero_rew, -shaped_rew, discount, deshape_fn)
     assert np.allclose(dist_opposite, 0, atol=1e-6)
+
+
+@hypothesis.given(
+    rews=hp_numpy.arrays(
+        np.float64,
+        st.tuples(
+            st.just(2),
+            st.integers(min_value=1, max_value=5),
+            st.integers(min_value=2, max_value=20),
+        ),
+        elements=st.floats(min_value=-1e3, max_value=1e3),
+        fill=st.nothing(),
+    ),
+)
+def test_pearson_distance_matrix(rews: np.ndarray) -> None:
+    """Test `pearson_distance_matrix` agrees with `pearson_distance` on each pair."""
+    rewxs, rewys = rews
+    hypothesis.assume(np.all(np.std(rews, axis=-1) > 1e-3))
+    actual = tabular.pearson_distance_matrix(rewxs, rewys)
+    assert actual.shape == (len(rewxs), len(rewys))
+    for i, rewx in enumerate(rewxs):
+        for j, rewy in enumerate(rewys):
+            assert np.allclose(actual[i, j], tabular.pearson_distance(rewx, rewy), atol=1e-6)
+
+    symmetric = tabular.pearson_distance_matrix(rewxs)
+    assert np.array_equal(symmetric, symmetric.T)
+    assert np.allclose(symmetric, tabular.pearson_distance_matrix(rewxs, rewxs))
+
+
+def _closest_potential_lstsq(reward: np.ndarray, target: np.ndarray, discount: float):
+    """Reference `closest_potential`: least squares on the explicit design matrix."""
+    n_states, n_actions, _ = reward.shape
+    eye = np.eye(n_states)
+    new_pot = discount * eye[np.newaxis, np.newaxis, :, :]
+    old_pot = eye[:, np.newaxis, np.newaxis, :]
+    x_vals = (new_pot - old_pot).repeat(n_actions, axis=1).reshape(-1, n_states)
+    y_vals = (target - reward).flatten()
+    potential, _, _, _ = np.linalg.lstsq(x_vals, y_vals, rcond=None)
+    return potential
+
+
+@pytest.mark.parametrize("n_states,n_actions", [(1, 1), (1, 3), (4, 1), (5, 2), (8, 3)])
+@pytest.mark.parametrize("discount", [0.0, 0.5, 0.99, 1.0])
+def test_closest_potential(n_states: int, n_actions: int, discount: float) -> None:
+    """Test `closest_potential` agrees with least squares, including when singular."""
+    rng = np.random.RandomState(seed=42)
+    shape = (n_states, n_actions, n_states)
+    reward = rng.standard_normal(shape)
+    target = rng.standard_normal(shape)
+
+    actual = tabular.closest_potential(reward, target, discount)
+    expected = _closest_potential_lstsq(reward, target, discount)
+    assert actual.shape == (n_states,)
+    assert np.allclose(actual, expected, atol=1e-8)